@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import time
 
-from confluent_kafka.avro import AvroConsumer
+from kafka_connector import startup
+from kafka_connector.config import ConnectorConfig
 
 __author__ = u'Stephan Müller'
 __copyright__ = u'2017, Stephan Müller'
@@ -16,11 +18,23 @@ default_config = {
 }
 
 
-class AvroLoopConsumer(AvroConsumer):
+class AvroLoopConsumer(object):
 
     """
     AvroConsumer with possibility to register an on_delivery function which is called whenever new messages arrive.
 
+    ``confluent_kafka`` is imported when the consumer connects, not when this module is imported. All attributes which
+    are not defined here (e.g. ``commit`` or ``assignment``) are delegated to the underlying
+    :class:`confluent_kafka.avro.AvroConsumer` once it is connected, see :meth:`connect()`. Import and connect times are
+    recorded in :mod:`kafka_connector.startup`.
+
+    .. versionchanged:: 0.1.0
+        No longer a subclass of :class:`confluent_kafka.avro.AvroConsumer`, so ``isinstance()`` checks against it
+        fail. The underlying client is returned by :meth:`connect()`.
+
+    The given config is never modified. Connection settings and ``error_cb`` are merged into a
+    :class:`~kafka_connector.config.ConnectorConfig`, see :attr:`config`.
+
     The default config is
 
     >>> default_config = {
@@ -31,7 +45,8 @@ class AvroLoopConsumer(AvroConsumer):
     """
 
     def __init__(self, bootstrap_servers, schema_registry_url, consumer_group, topics, config=default_config,
-                 error_callback=lambda err: AvroLoopConsumer.error_callback(err)):
+                 error_callback=lambda err: AvroLoopConsumer.error_callback(err), defer_connect=False,
+                 profiler=None):
         """
 
         :param bootstrap_servers: Initial list of brokers as a CSV list of broker host or host:port.
@@ -43,29 +58,78 @@ class AvroLoopConsumer(AvroConsumer):
         :type topics: list(str)
         :param config: A config dictionary with properties listed at
             https://github.com/edenhill/librdkafka/blob/master/CONFIGURATION.md
-        :type config: dict
+        :type config: dict or :class:`~kafka_connector.config.ConnectorConfig`
         :param error_callback: function that handles occurring error events
         :type error_callback: lambda err: function(err)
+        :param defer_connect: If `True`, the client is created and subscribed on first :meth:`loop()` instead of here
+        :type defer_connect: bool
+        :param profiler: If set, :meth:`loop()` records the phases ``poll``, ``decode`` and ``handler`` and the unit
+            ``message`` (decode and handler of a single message)
+        :type profiler: :class:`~kafka_connector.profiling.PhaseProfiler`
+
+        :raises AttributeError: if the config is invalid
         """
 
+        self._client = None
         self._topics = topics
-        self._config = config
-
-        if error_callback is not None:
-            self._config.update({"error_cb": error_callback})
+        self._profiler = profiler
 
-        self._config['bootstrap.servers'] = bootstrap_servers
-        self._config['schema.registry.url'] = schema_registry_url
-        self._config['group.id'] = consumer_group
+        overrides = {
+            'bootstrap.servers': bootstrap_servers,
+            'schema.registry.url': schema_registry_url,
+            'group.id': consumer_group,
+        }
 
-        super(AvroLoopConsumer, self).__init__(self._config)
+        if error_callback is not None:
+            overrides['error_cb'] = error_callback
 
-        super(AvroLoopConsumer, self).subscribe(self._topics)
+        self._config = ConnectorConfig(config, overrides)
 
         self._started = False
         self._running = False
         self._stopped = False
 
+        if not defer_connect:
+            self.connect()
+
+    def __getattr__(self, name):
+        # only reached for attributes not defined on the loop consumer, e.g. commit() or assignment()
+        if name.startswith('_') or self._client is None:
+            raise AttributeError(name)
+        return getattr(self._client, name)
+
+    @property
+    def config(self):
+        """
+        :return: the merged config used for the underlying client
+        :rtype: :class:`~kafka_connector.config.ConnectorConfig`
+        """
+        return self._config
+
+    def connect(self):
+        """
+        Creates the underlying :class:`confluent_kafka.avro.AvroConsumer` and subscribes to the topics. Does nothing if
+        the consumer is already connected.
+
+        :return: the underlying consumer
+        :rtype: :class:`confluent_kafka.avro.AvroConsumer`
+        """
+
+        if self._client is not None:
+            return self._client
+
+        with startup.timed("AvroLoopConsumer.connect"):
+            avro = startup.import_module('confluent_kafka.avro')
+
+            with startup.timed("AvroLoopConsumer.create_client"):
+                client = avro.AvroConsumer(self._config.to_dict())
+
+            with startup.timed("AvroLoopConsumer.subscribe"):
+                client.subscribe(self._topics)
+
+        self._client = client
+        return self._client
+
     def loop(self, on_delivery, timeout=None):
         """
         Consumes and decodes Avro messages from kafka
@@ -79,10 +143,18 @@ class AvroLoopConsumer(AvroConsumer):
         if not callable(on_delivery):
             raise AttributeError("on_delivery is not callable")
 
+        client = self.connect()
+        profiler = self._profiler
+        message_start = None
+
         self._started = True
         self._running = True
         while self._running:
-            msg = super(AvroLoopConsumer, self).poll(timeout)
+            if profiler is None:
+                msg = client.poll(timeout)
+            else:
+                msg, message_start = self._profiled_poll(client, timeout)
+
             if msg is None:
                 logger.info("poll() timeout")
             elif msg.error():
@@ -91,11 +163,54 @@ class AvroLoopConsumer(AvroConsumer):
             else:
                 logger.info("Received message from topic '%s' with offset %s"
                             % (str(msg.topic()), str(msg.offset())))
-                on_delivery(msg)
 
-        super(AvroLoopConsumer, self).close()
+                if profiler is None:
+                    on_delivery(msg)
+                else:
+                    handler_start = time.perf_counter_ns()
+                    on_delivery(msg)
+                    profiler.lap('handler', handler_start)
+                    profiler.end('message', message_start)
+
+        client.close()
         self._stopped = True
 
+    def _profiled_poll(self, client, timeout):
+        """
+        Same as :func:`confluent_kafka.avro.AvroConsumer.poll()`, but polling and decoding are timed separately.
+
+        :return: message and start of its ``message`` unit or `None` if the poll returned no message
+        :rtype: tuple
+        """
+
+        consumer = startup.import_module('confluent_kafka').Consumer
+
+        poll_start = time.perf_counter_ns()
+        msg = consumer.poll(client, -1 if timeout is None else timeout)
+        self._profiler.lap('poll', poll_start)
+
+        if msg is None or msg.error():
+            return msg, None
+
+        serializer = startup.import_module('confluent_kafka.avro.serializer')
+        message_start = self._profiler.begin()
+
+        # mirrors AvroConsumer.poll()
+        try:
+            if msg.value() is not None:
+                msg.set_value(client._serializer.decode_message(msg.value(), is_key=False))
+
+            if msg.key() is not None:
+                msg.set_key(client._serializer.decode_message(msg.key(), is_key=True))
+
+        except serializer.SerializerError as e:
+            raise serializer.SerializerError("Message deserialization failed for message at %s [%s] offset %s: %s"
+                                             % (msg.topic(), msg.partition(), msg.offset(), e))
+
+        self._profiler.lap('decode', message_start)
+
+        return msg, message_start
+
     def stop(self):
         """
         Stops the timer if it is running
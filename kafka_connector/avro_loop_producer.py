@@ -2,12 +2,9 @@
 
 import logging
 import time
-import requests.exceptions
-
-from avro.schema import SchemaParseException
-from confluent_kafka import avro
-from confluent_kafka.avro import AvroProducer
 
+from kafka_connector import startup
+from kafka_connector.config import ConnectorConfig, shared_client
 from kafka_connector.timer import Timer, Begin, Unit
 
 __author__ = u'Stephan Müller'
@@ -16,6 +13,13 @@ __license__ = u'MIT'
 
 logger = logging.getLogger(__name__)
 
+_unit_seconds = {
+    Unit.MILLISECOND: 0.001,
+    Unit.SECOND: 1,
+    Unit.MINUTE: 60,
+    Unit.HOUR: 3600,
+}
+
 default_config = {
     'log_level': 0,
     'api.version.request': True,
@@ -29,10 +33,22 @@ default_config = {
 }
 
 
-class AvroLoopProducer(AvroProducer):
+class AvroLoopProducer(object):
 
     """AvroProducer with integrated timer function that calls a data producing function every defined interval.
 
+    ``confluent_kafka``, ``avro`` and ``requests`` are imported when the producer connects, not when this module is
+    imported. All attributes which are not defined here (e.g. ``flush`` or ``poll``) are delegated to the underlying
+    :class:`confluent_kafka.avro.AvroProducer` once it is connected, see :meth:`connect()`. Import and connect times are
+    recorded in :mod:`kafka_connector.startup`.
+
+    .. versionchanged:: 0.1.0
+        No longer a subclass of :class:`confluent_kafka.avro.AvroProducer`, so ``isinstance()`` checks against it
+        fail. The underlying client is returned by :meth:`connect()`.
+
+    The given config is never modified. Connection settings and ``error_cb`` are merged into a
+    :class:`~kafka_connector.config.ConnectorConfig`, see :attr:`config`.
+
     The default config is
 
     >>> default_config = {
@@ -50,7 +66,8 @@ class AvroLoopProducer(AvroProducer):
     """
 
     def __init__(self, bootstrap_servers, schema_registry_url, topic, key_schema, value_schema, poll_timeout=0.01,
-                 config=default_config, error_callback=lambda err: AvroLoopProducer.error_callback(err)):
+                 config=default_config, error_callback=lambda err: AvroLoopProducer.error_callback(err),
+                 defer_connect=False, share_client=False, profiler=None, pacing=None):
         """
 
         :param bootstrap_servers: Initial list of brokers as a CSV list of broker host or host:port.
@@ -68,36 +85,124 @@ class AvroLoopProducer(AvroProducer):
         :type poll_timeout: None, float
         :param config: A config dictionary with properties listed at
             https://github.com/edenhill/librdkafka/blob/master/CONFIGURATION.md
-        :type config: dict
+        :type config: dict or :class:`~kafka_connector.config.ConnectorConfig`
         :param error_callback: function that handles occurring error events
         :type error_callback: lambda err: function(err)
-
-        :raises avro.schema.SchemaParseException: if either key or value schema is invalid
+        :param defer_connect: If `True`, schemas are parsed and the client is created on first :meth:`produce()` or
+            :meth:`loop()` instead of here
+        :type defer_connect: bool
+        :param share_client: If `True`, all producers with an identical resulting :attr:`config` use the same
+            underlying client, independent of topic and schemas
+        :type share_client: bool
+        :param profiler: If set, records the phases ``data_function``, ``encode``, ``enqueue`` and ``poll`` and the
+            timer phases described in :class:`~kafka_connector.timer.Timer`
+        :type profiler: :class:`~kafka_connector.profiling.PhaseProfiler`
+        :param pacing: If set, limits the produce rate, spreads the messages of one :meth:`loop()` interval and waits
+            while the librdkafka queue is too full. Time spent waiting is recorded as phase ``pace``.
+        :type pacing: :class:`~kafka_connector.pacing.Pacer`
+
+        :raises avro.schema.SchemaParseException: if either key or value schema is invalid and `defer_connect` is
+            `False`
+        :raises AttributeError: if the config is invalid
         """
 
         self._timer = None
+        self._client = None
+        # pacing waits are interrupted once stop() is called while loop() is running
+        self._looping = False
+        self._stopping = False
 
         self._topic = topic
-        self._config = config
         self._poll_timeout = poll_timeout
+        self._share_client = share_client
+        self._profiler = profiler
+
+        overrides = {
+            'bootstrap.servers': bootstrap_servers,
+            'schema.registry.url': schema_registry_url,
+        }
 
         if error_callback is not None:
-            self._config.update({"error_cb": error_callback})
+            overrides['error_cb'] = error_callback
 
-        self._config['bootstrap.servers'] = bootstrap_servers
-        self._config['schema.registry.url'] = schema_registry_url
+        self._config = ConnectorConfig(config, overrides)
 
-        try:
-            self._key_schema = avro.load(key_schema)
-        except SchemaParseException:
-            raise SchemaParseException("Invalid Avro schema for key")
+        self._pacer = pacing
+        self._interval_seconds = None
 
-        try:
-            self._value_schema = avro.load(value_schema)
-        except SchemaParseException:
-            raise SchemaParseException("Invalid Avro schema for value")
+        # expected duration of one produce() call, used to keep spread messages within the interval
+        self._produce_seconds = poll_timeout if isinstance(poll_timeout, (int, float)) and \
+            not isinstance(poll_timeout, bool) else 0.
+
+        if pacing is not None:
+            self._max_queue_depth = pacing.max_queue_depth or \
+                int(0.8 * int(self._config.get('queue.buffering.max.messages', 100000)))
+
+        self._key_schema_file = key_schema
+        self._value_schema_file = value_schema
+        self._key_schema = None
+        self._value_schema = None
+
+        if not defer_connect:
+            self.connect()
+
+    def __getattr__(self, name):
+        # only reached for attributes not defined on the loop producer, e.g. flush() or poll()
+        if name.startswith('_') or self._client is None:
+            raise AttributeError(name)
+        return getattr(self._client, name)
+
+    def __len__(self):
+        if self._client is None:
+            return 0
+        return len(self._client)
+
+    @property
+    def config(self):
+        """
+        :return: the merged config used for the underlying client
+        :rtype: :class:`~kafka_connector.config.ConnectorConfig`
+        """
+        return self._config
+
+    def connect(self):
+        """
+        Parses key and value schema and creates the underlying :class:`confluent_kafka.avro.AvroProducer`. Does
+        nothing if the producer is already connected.
+
+        :return: the underlying producer
+        :rtype: :class:`confluent_kafka.avro.AvroProducer`
+
+        :raises avro.schema.SchemaParseException: if either key or value schema is invalid
+        """
+
+        if self._client is not None:
+            return self._client
 
-        super(AvroLoopProducer, self).__init__(self._config, default_key_schema=self._key_schema, default_value_schema=self._value_schema)
+        with startup.timed("AvroLoopProducer.connect"):
+            avro = startup.import_module('confluent_kafka.avro')
+            schema_parse_exception = startup.import_module('avro.schema').SchemaParseException
+
+            with startup.timed("AvroLoopProducer.parse_schemas"):
+                try:
+                    self._key_schema = avro.load(self._key_schema_file)
+                except schema_parse_exception:
+                    raise schema_parse_exception("Invalid Avro schema for key")
+
+                try:
+                    self._value_schema = avro.load(self._value_schema_file)
+                except schema_parse_exception:
+                    raise schema_parse_exception("Invalid Avro schema for value")
+
+            # schemas are passed on every produce() call, so a shared client does not depend on them
+            with startup.timed("AvroLoopProducer.create_client"):
+                if self._share_client:
+                    self._client = shared_client((avro.AvroProducer, self._config),
+                                                 lambda: avro.AvroProducer(self._config.to_dict()))
+                else:
+                    self._client = avro.AvroProducer(self._config.to_dict())
+
+        return self._client
 
     def produce(self, key=None, value=None, timestamp=None, partition=None,
                 on_delivery=lambda err, msg: AvroLoopProducer.on_delivery(err, msg)):
@@ -123,12 +228,6 @@ class AvroLoopProducer(AvroProducer):
 
         kwargs = dict()
 
-        if key is not None:
-            kwargs['key'] = key
-
-        if value is not None:
-            kwargs['value'] = value
-
         if partition is not None:
             kwargs['partition'] = partition
 
@@ -138,16 +237,118 @@ class AvroLoopProducer(AvroProducer):
         if on_delivery is not None:
             kwargs.update({"on_delivery": on_delivery})
 
+        if key is not None:
+            kwargs['key'] = key
+
+        if value is not None:
+            kwargs['value'] = value
+
+        client = self.connect()
+        profiler = self._profiler
+
         try:
-            super(AvroLoopProducer, self).produce(topic=self._topic, **kwargs)
+            # the profiler times encoding and enqueueing separately, byte pacing needs the encoded size
+            if profiler is not None or (self._pacer is not None and self._pacer.bytes is not None):
+                self._encode_and_enqueue(client, kwargs)
+
+            else:
+                if self._pacer is not None:
+                    self._wait(client, self._pacer.reserve(0))
+
+                client.produce(topic=self._topic, key_schema=self._key_schema, value_schema=self._value_schema,
+                               **kwargs)
 
         # if connection to schema registry server is down
-        except requests.exceptions.ConnectionError:
+        except startup.import_module('requests.exceptions').ConnectionError:
             logger.error("Schema registry server is not reachable.")
             time.sleep(1)
 
         if type(self._poll_timeout) != bool:
-            super(AvroLoopProducer, self).poll(timeout=self._poll_timeout)
+            if profiler is not None:
+                phase_start = time.perf_counter_ns()
+
+            client.poll(timeout=self._poll_timeout)
+
+            if profiler is not None:
+                profiler.lap('poll', phase_start)
+
+    def _encode_and_enqueue(self, client, kwargs):
+        """
+        Same as :func:`confluent_kafka.avro.AvroProducer.produce()`, but encoding, pacing and enqueueing are separate
+        steps, so they can be timed on their own and the encoded size is known before the message is enqueued.
+
+        :param client: the connected producer
+        :type client: :class:`confluent_kafka.avro.AvroProducer`
+        :param kwargs: arguments for :func:`confluent_kafka.Producer.produce()` without `topic`, key and value are
+            replaced by their encoded form
+        :type kwargs: dict
+        """
+
+        serializer = startup.import_module('confluent_kafka.avro.serializer')
+        profiler = self._profiler
+
+        if profiler is not None:
+            phase_start = time.perf_counter_ns()
+
+        # mirrors AvroProducer.produce()
+        if kwargs.get('value') is not None:
+            if not self._value_schema:
+                raise serializer.ValueSerializerError("Avro schema required for values")
+            kwargs['value'] = client._serializer.encode_record_with_schema(self._topic, self._value_schema,
+                                                                           kwargs['value'])
+
+        if kwargs.get('key') is not None:
+            if not self._key_schema:
+                raise serializer.KeySerializerError("Avro schema required for key")
+            kwargs['key'] = client._serializer.encode_record_with_schema(self._topic, self._key_schema,
+                                                                         kwargs['key'], True)
+
+        if profiler is not None:
+            profiler.lap('encode', phase_start)
+
+        if self._pacer is not None:
+            self._wait(client, self._pacer.reserve(len(kwargs.get('key') or b'') + len(kwargs.get('value') or b'')))
+
+        if profiler is not None:
+            phase_start = time.perf_counter_ns()
+
+        startup.import_module('confluent_kafka').Producer.produce(client, self._topic, **kwargs)
+
+        if profiler is not None:
+            profiler.lap('enqueue', phase_start)
+
+    @property
+    def _interrupted(self):
+        return self._looping and self._stopping
+
+    def _wait(self, client, seconds):
+        """
+        Polls for delivery reports for :data:`seconds` and afterwards as long as the queue of the client is not below
+        the maximum queue depth of the pacer. Returns early once :meth:`stop()` has been called during :meth:`loop()`.
+
+        :param seconds: time to wait, non-positive values only check the queue
+        :type seconds: float
+        """
+
+        if self._profiler is not None:
+            phase_start = time.perf_counter_ns()
+
+        deadline = time.perf_counter() + seconds
+        remaining = seconds
+
+        # poll() returns as soon as a callback was served, so keep polling until the deadline
+        while remaining > 0 and not self._interrupted:
+            client.poll(min(remaining, 0.1))
+            remaining = deadline - time.perf_counter()
+
+        if not self._interrupted and len(client) >= self._max_queue_depth:
+            logger.debug("Producer queue holds %d messages, waiting for deliveries" % len(client))
+
+            while not self._interrupted and len(client) >= self._max_queue_depth:
+                client.poll(0.01)
+
+        if self._profiler is not None:
+            self._profiler.lap('pace', phase_start)
 
     def _loop_produce(self, data_function):
         """
@@ -158,12 +359,21 @@ class AvroLoopProducer(AvroProducer):
             `timestamp`, `partition` and `on_delivery`
         """
 
-        data_sets = data_function()
+        tick_start = time.perf_counter()
+
+        if self._profiler is None:
+            data_sets = data_function()
+        else:
+            phase_start = time.perf_counter_ns()
+            data_sets = data_function()
+            self._profiler.lap('data_function', phase_start)
 
         if type(data_sets) is not list:
 
             data_sets = [data_sets]
 
+        messages = []
+
         for data in data_sets:
 
             if data is None:
@@ -177,7 +387,25 @@ class AvroLoopProducer(AvroProducer):
                                " or 'timestamp'. Continue without sending any message.")
 
             else:
-                self.produce(**data)
+                messages.append(data)
+
+        spacing = 0.
+
+        # spread over the time left in this interval, minus the duration of the last produce() call
+        if self._pacer is not None and self._pacer.spread and self._interval_seconds and len(messages) > 1:
+            budget = tick_start + self._interval_seconds - time.perf_counter() - self._produce_seconds
+            spacing = max(0., budget) / len(messages)
+
+        start = time.perf_counter()
+
+        for i, data in enumerate(messages):
+
+            if spacing:
+                self._wait(self._client, start + i * spacing - time.perf_counter())
+
+            produce_start = time.perf_counter()
+            self.produce(**data)
+            self._produce_seconds = 0.8 * self._produce_seconds + 0.2 * (time.perf_counter() - produce_start)
 
     def loop(self, data_function, interval=1, unit=Unit.SECOND, begin=Begin.FULL_SECOND):
         """
@@ -195,19 +423,29 @@ class AvroLoopProducer(AvroProducer):
             the closest from the current timestamp.
         :type begin: :class:`kafka_connector.timer.Begin` or list of :class:`datetime.time`
         """
-        self._timer = Timer(lambda: self._loop_produce(data_function), interval, unit, begin)
+        self.connect()
+        self._interval_seconds = interval * _unit_seconds[unit]
+
+        self._timer = Timer(lambda: self._loop_produce(data_function), interval, unit, begin, profiler=self._profiler)
+        self._stopping = False
+        self._looping = True
         try:
             self._timer.start()
         except KeyboardInterrupt:
-            super(AvroLoopProducer, self).flush(0.1)
+            self._client.flush(0.1)
             # todo handle KeyboardInterrupt
             return
+        finally:
+            self._looping = False
 
     def stop(self):
         """
-        Stops the timer if it is running
+        Stops the timer if it is running. Pacing waits of the running loop return immediately, remaining messages of
+        the current interval are sent without delay. Later calls of :meth:`produce()` are paced again.
         """
-        if self._timer is not None and not self._timer.is_stopped():
+        self._stopping = True
+
+        if self._timer is not None and not self._timer.is_stopped:
             self._timer.stop()
 
     @staticmethod
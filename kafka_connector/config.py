@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import logging
+import threading
+import weakref
+
+__author__ = u'Stephan Müller'
+__copyright__ = u'2017, Stephan Müller'
+__license__ = u'MIT'
+
+logger = logging.getLogger(__name__)
+
+#: properties which must be non-empty strings if they are set
+string_properties = ('bootstrap.servers', 'schema.registry.url', 'group.id')
+
+_shared_clients = weakref.WeakValueDictionary()
+_shared_clients_lock = threading.Lock()
+
+
+class ConnectorConfig(Mapping):
+
+    """
+    Immutable and hashable config dictionary with properties listed at
+    https://github.com/edenhill/librdkafka/blob/master/CONFIGURATION.md
+
+    The config is created by merging any number of layers, e.g. defaults, profiles and overrides. Later layers win,
+    nested dictionaries like ``default.topic.config`` are merged key by key. None of the layers is modified.
+
+    >>> defaults = {'log_level': 0, 'default.topic.config': {'produce.offset.report': True}}
+    >>> config = ConnectorConfig(defaults, {'queue.buffering.max.ms': 50}, {'bootstrap.servers': 'kafka:9092'})
+    >>> config.merge({'log_level': 7})['log_level']
+    7
+
+    Nested dictionaries are stored as :class:`ConnectorConfig` as well. Use :meth:`to_dict()` to get a plain and
+    mutable copy, e.g. for passing it to a client.
+    """
+
+    __slots__ = ('_items', '_dict', '_hash')
+
+    def __init__(self, *layers):
+        """
+
+        :param layers: dictionaries or :class:`ConnectorConfig` objects to merge, `None` elements are skipped
+        :type layers: dict or ConnectorConfig
+
+        :raises AttributeError: if a layer is not a dictionary, a property name is not a non-empty string, a
+            connection property is not a non-empty string or a value is not hashable
+        """
+
+        merged = dict()
+
+        for layer in layers:
+
+            if layer is None:
+                continue
+
+            if not isinstance(layer, Mapping):
+                raise AttributeError("config layer must be a dict or ConnectorConfig, got " + str(type(layer)))
+
+            for key, value in layer.items():
+                if isinstance(value, Mapping) and isinstance(merged.get(key), ConnectorConfig):
+                    value = merged[key].merge(value)
+                merged[key] = _validate(key, value)
+
+        items = tuple(sorted(merged.items(), key=lambda item: item[0]))
+
+        try:
+            config_hash = hash(items)
+        except TypeError:
+            raise AttributeError("config values must be hashable")
+
+        object.__setattr__(self, '_items', items)
+        object.__setattr__(self, '_dict', merged)
+        object.__setattr__(self, '_hash', config_hash)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConnectorConfig is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ConnectorConfig is immutable")
+
+    def __reduce__(self):
+        return ConnectorConfig, (self.to_dict(),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getitem__(self, key):
+        return self._dict[key]
+
+    def __iter__(self):
+        return iter(key for key, _ in self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, ConnectorConfig):
+            return self._hash == other._hash and self._items == other._items
+        return Mapping.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "ConnectorConfig(" + repr(self.to_dict()) + ")"
+
+    def merge(self, *layers):
+        """
+        :param layers: dictionaries or :class:`ConnectorConfig` objects which override properties of this config
+        :type layers: dict or ConnectorConfig
+
+        :return: a new config, this config is left unchanged
+        :rtype: ConnectorConfig
+        """
+        return ConnectorConfig(self, *layers)
+
+    def to_dict(self):
+        """
+        :return: a new mutable dictionary including nested dictionaries
+        :rtype: dict
+        """
+        return dict((key, value.to_dict() if isinstance(value, ConnectorConfig) else value)
+                    for key, value in self._items)
+
+
+def shared_client(key, factory):
+    """
+    Returns the client registered for :data:`key` or creates it with :data:`factory`. Clients are held weakly, so a
+    client is closed as soon as no instance uses it anymore.
+
+    :param key: hashable key, e.g. a tuple of client type and :class:`ConnectorConfig`
+    :type key: tuple
+    :param factory: creates the client if there is none for :data:`key`
+    :type factory: callable
+
+    :return: client for :data:`key`
+    """
+
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+
+        if client is None:
+            client = factory()
+            _shared_clients[key] = client
+
+        else:
+            logger.debug("Reusing client for %s" % str(key[0]))
+
+        return client
+
+
+def _validate(key, value):
+    """
+    :return: value, dictionaries are converted to :class:`ConnectorConfig`
+    """
+
+    if not isinstance(key, str) or not key:
+        raise AttributeError("config property name must be a non-empty string, got " + repr(key))
+
+    if isinstance(value, Mapping):
+        return value if isinstance(value, ConnectorConfig) else ConnectorConfig(value)
+
+    if key in string_properties and (not isinstance(value, str) or not value):
+        raise AttributeError("config property '" + key + "' must be a non-empty string")
+
+    try:
+        hash(value)
+    except TypeError:
+        raise AttributeError("value of config property '" + key + "' must be hashable, got " + repr(value))
+
+    return value
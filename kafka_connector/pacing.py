@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+__author__ = u'Stephan Müller'
+__copyright__ = u'2017, Stephan Müller'
+__license__ = u'MIT'
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+
+    """
+    Token bucket which is refilled with :data:`rate` tokens per second up to :data:`capacity` tokens. Tokens are
+    reserved in advance, so the bucket may become negative and a request larger than the capacity does not block
+    forever.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+
+        :param rate: tokens per second
+        :type rate: float
+        :param capacity: maximum number of tokens, defaults to :data:`rate` (burst of one second)
+        :type capacity: float
+        """
+
+        if not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate <= 0:
+            raise AttributeError("rate must be a positive number")
+
+        if capacity is not None and (not isinstance(capacity, (int, float)) or capacity <= 0):
+            raise AttributeError("capacity must be None or a positive number")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+
+        self._tokens = self.capacity
+        self._updated = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        Takes :data:`tokens` from the bucket.
+
+        :param tokens: number of tokens
+        :type tokens: float
+
+        :return: seconds to wait until the reserved tokens are available, `0.` if they are available right now
+        :rtype: float
+        """
+
+        with self._lock:
+            now = time.perf_counter()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+
+            if self._tokens >= 0:
+                return 0.
+
+            return -self._tokens / self.rate
+
+
+class Pacer(object):
+
+    """
+    Pacing settings for :class:`~kafka_connector.avro_loop_producer.AvroLoopProducer`.
+
+    Every produced message takes one token from the message bucket and its encoded size from the byte bucket. If
+    :data:`spread` is set, the messages returned by one call of ``data_function`` are distributed evenly over the loop
+    interval instead of being sent at once. Before a message is enqueued, the producer waits as long as the number of
+    messages in the librdkafka queue is at least :data:`max_queue_depth`.
+
+    While waiting, the producer polls for delivery reports instead of sleeping.
+    """
+
+    def __init__(self, messages_per_second=None, bytes_per_second=None, burst=1., spread=True, max_queue_depth=None):
+        """
+
+        :param messages_per_second: maximum message rate, `None` for no limit
+        :type messages_per_second: float
+        :param bytes_per_second: maximum rate of encoded key and value bytes, `None` for no limit
+        :type bytes_per_second: float
+        :param burst: seconds of full rate which may be sent at once after the producer has been idle
+        :type burst: float
+        :param spread: distribute the messages of one loop interval evenly over the interval
+        :type spread: bool
+        :param max_queue_depth: queue size at which producing is paused, defaults to 80 % of
+            ``queue.buffering.max.messages``
+        :type max_queue_depth: int
+        """
+
+        if not isinstance(burst, (int, float)) or burst <= 0:
+            raise AttributeError("burst must be a positive number")
+
+        if max_queue_depth is not None and (type(max_queue_depth) != int or max_queue_depth < 1):
+            raise AttributeError("max_queue_depth must be None or a positive int")
+
+        self.messages = None
+        self.bytes = None
+
+        if messages_per_second is not None:
+            self.messages = TokenBucket(messages_per_second, max(1., messages_per_second * burst))
+
+        if bytes_per_second is not None:
+            self.bytes = TokenBucket(bytes_per_second, bytes_per_second * burst)
+
+        self.spread = spread
+        self.max_queue_depth = max_queue_depth
+
+    def reserve(self, size):
+        """
+        Takes one message and :data:`size` bytes from the buckets.
+
+        :param size: encoded size of the message in bytes
+        :type size: int
+
+        :return: seconds to wait before the message may be sent
+        :rtype: float
+        """
+
+        delay = 0.
+
+        if self.messages is not None:
+            delay = self.messages.reserve(1)
+
+        if self.bytes is not None:
+            delay = max(delay, self.bytes.reserve(size))
+
+        return delay
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+import heapq
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+
+__author__ = u'Stephan Müller'
+__copyright__ = u'2017, Stephan Müller'
+__license__ = u'MIT'
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram(object):
+
+    """
+    Histogram of durations in nanoseconds with power of two buckets. Bucket ``i`` counts durations ``d`` with
+    ``2 ** (i - 1) <= d < 2 ** i``, so recording a value is a single list increment.
+    """
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * 65
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, duration_ns):
+        """
+        :param duration_ns: duration in nanoseconds
+        :type duration_ns: int
+        """
+
+        duration_ns = max(0, duration_ns)
+
+        self.buckets[min(duration_ns.bit_length(), 64)] += 1
+        self.count += 1
+        self.total += duration_ns
+
+        if self.min is None or duration_ns < self.min:
+            self.min = duration_ns
+
+        if self.max is None or duration_ns > self.max:
+            self.max = duration_ns
+
+    def percentile(self, percent):
+        """
+        :param percent: percentile between 0 and 100
+        :type percent: float
+
+        :return: upper bound of the bucket containing the percentile in nanoseconds or `None` if nothing was recorded
+        :rtype: int
+        """
+
+        if self.count == 0:
+            return None
+
+        rank = percent / 100. * self.count
+        seen = 0
+
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if bucket and seen >= rank:
+                return min(2 ** i - 1, self.max)
+
+        return self.max
+
+    def to_dict(self):
+        """
+        :return: summary and non-empty buckets keyed by their upper bound in nanoseconds
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'total_ns': self.total,
+            'mean_ns': self.total // self.count if self.count else None,
+            'min_ns': self.min,
+            'max_ns': self.max,
+            'p50_ns': self.percentile(50),
+            'p90_ns': self.percentile(90),
+            'p99_ns': self.percentile(99),
+            'buckets': dict((str(2 ** i - 1), bucket) for i, bucket in enumerate(self.buckets) if bucket),
+        }
+
+
+class PhaseProfiler(object):
+
+    """
+    Records the duration of phases like ``poll``, ``decode`` or ``handler`` into :class:`Histogram` objects. Pass an
+    instance as ``profiler`` to :class:`~kafka_connector.timer.Timer`,
+    :class:`~kafka_connector.avro_loop_producer.AvroLoopProducer` or
+    :class:`~kafka_connector.avro_loop_consumer.AvroLoopConsumer`.
+
+    Whole units of work (a timer ``tick`` or a consumed ``message``) are recorded as well. After calling
+    :meth:`capture()`, the call stacks of the slowest units are sampled and can be written with
+    :meth:`dump_collapsed()` for flame graph tools or with :meth:`dump_json()` together with all histograms.
+
+    One instance may be shared between threads, e.g. by a producer and a consumer running side by side. Every thread
+    has its own current unit, a unit which is started with :meth:`begin()` but never ended is discarded with the next
+    :meth:`begin()` of the same thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = dict()
+        self._sampler = None
+        self._captures = []
+        self._capture_count = 0
+        self._sequence = itertools.count()
+
+    def record(self, phase, duration_ns):
+        """
+        :param phase: name of the phase
+        :type phase: str
+        :param duration_ns: duration in nanoseconds
+        :type duration_ns: int
+        """
+
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram()
+            histogram.record(duration_ns)
+
+    def lap(self, phase, start_ns):
+        """
+        Records the time since :data:`start_ns` for :data:`phase`.
+
+        :return: current :func:`time.perf_counter_ns()`, used as start of the next phase
+        :rtype: int
+        """
+
+        now = time.perf_counter_ns()
+        self.record(phase, now - start_ns)
+        return now
+
+    def begin(self):
+        """
+        Starts a unit of work in the current thread and samples its call stack if capturing is enabled. Samples of a
+        previous unit of this thread which has not been ended are dropped.
+
+        :return: start time for :meth:`end()`
+        :rtype: int
+        """
+
+        sampler = self._sampler
+        if sampler is not None:
+            sampler.track(threading.get_ident())
+
+        return time.perf_counter_ns()
+
+    def end(self, unit, start_ns):
+        """
+        Ends a unit of work started with :meth:`begin()` and records its duration for :data:`unit`.
+
+        :param unit: name of the unit, e.g. ``"tick"`` or ``"message"``
+        :type unit: str
+        :param start_ns: return value of :meth:`begin()`
+        :type start_ns: int
+        """
+
+        duration_ns = time.perf_counter_ns() - start_ns
+        self.record(unit, duration_ns)
+
+        sampler = self._sampler
+        if sampler is None:
+            return
+
+        stacks = sampler.untrack(threading.get_ident())
+        if stacks is None:
+            return
+
+        with self._lock:
+            capture = (duration_ns, next(self._sequence), unit, stacks)
+
+            if len(self._captures) < self._capture_count:
+                heapq.heappush(self._captures, capture)
+            elif self._captures and duration_ns > self._captures[0][0]:
+                heapq.heapreplace(self._captures, capture)
+
+    def capture(self, count=10, sample_interval=0.001):
+        """
+        Starts sampling the call stacks of units and keeps the slowest :data:`count` of them.
+
+        :param count: number of units to keep
+        :type count: int
+        :param sample_interval: seconds between two stack samples
+        :type sample_interval: float
+        """
+
+        if type(count) != int or count < 1:
+            raise AttributeError("count must be a positive int")
+
+        self.stop_capture()
+        self._capture_count = count
+        self._sampler = _StackSampler(sample_interval)
+        self._sampler.start()
+
+    def stop_capture(self):
+        """
+        Stops sampling call stacks. Already captured units are kept.
+        """
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+
+    def reset(self):
+        """
+        Removes all recorded durations and captured units
+        """
+        with self._lock:
+            self._histograms = dict()
+            self._captures = []
+
+    @property
+    def histograms(self):
+        """
+        :return: histogram per phase or unit
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._histograms)
+
+    @property
+    def captures(self):
+        """
+        :return: captured units, slowest first, as dicts with keys `unit`, `duration_ns`, `samples` and `stacks`
+        :rtype: list(dict)
+        """
+        return [{
+            'unit': unit,
+            'duration_ns': duration_ns,
+            'samples': sum(stacks.values()),
+            'stacks': dict(stacks),
+        } for duration_ns, _, unit, stacks in sorted(self._snapshot_captures(), reverse=True)]
+
+    def to_dict(self):
+        """
+        :return: all histograms and captured units
+        :rtype: dict
+        """
+        return {
+            'phases': dict((phase, histogram.to_dict()) for phase, histogram in self.histograms.items()),
+            'captures': self.captures,
+        }
+
+    def dump_json(self, path):
+        """
+        Writes :meth:`to_dict()` as JSON
+
+        :param path: output file
+        :type path: str
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    def dump_collapsed(self, path):
+        """
+        Writes the stacks of all captured units in collapsed format (``frame;frame;frame count``) which is read by
+        flamegraph.pl, speedscope and similar tools. Every stack starts with the name of its unit.
+
+        :param path: output file
+        :type path: str
+        """
+
+        stacks = Counter()
+        for _, _, unit, unit_stacks in self._snapshot_captures():
+            for stack, samples in unit_stacks.items():
+                stacks[unit + ";" + stack] += samples
+
+        with open(path, 'w') as f:
+            for stack, samples in sorted(stacks.items()):
+                f.write("%s %d\n" % (stack, samples))
+
+
+    def _snapshot_captures(self):
+        with self._lock:
+            return list(self._captures)
+
+
+class _StackSampler(threading.Thread):
+
+    """
+    Daemon thread which periodically samples the call stacks of all tracked threads
+    """
+
+    def __init__(self, interval):
+        super(_StackSampler, self).__init__(name="kafka_connector-stack-sampler")
+        self.daemon = True
+        self.interval = interval
+        # thread id -> Counter of collapsed stacks of the current unit of this thread
+        self._threads = dict()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def track(self, thread_id):
+        """
+        Starts sampling :data:`thread_id`, replacing the samples of a unit which has not been ended
+        """
+        with self._lock:
+            self._threads[thread_id] = Counter()
+
+    def untrack(self, thread_id):
+        """
+        :return: samples of :data:`thread_id` since :meth:`track()` or `None` if the thread is not tracked
+        :rtype: Counter
+        """
+        with self._lock:
+            return self._threads.pop(thread_id, None)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                if not self._threads:
+                    continue
+
+                frames = sys._current_frames()
+                for thread_id, stacks in self._threads.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _collapse(frame):
+    """
+    :return: stack from outermost to innermost frame, separated by ``;``
+    :rtype: str
+    """
+
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append("%s (%s:%d)" % (code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+
+    return ";".join(reversed(frames))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import importlib
+import logging
+import sys
+import time
+
+__author__ = u'Stephan Müller'
+__copyright__ = u'2017, Stephan Müller'
+__license__ = u'MIT'
+
+logger = logging.getLogger(__name__)
+
+_timings = OrderedDict()
+
+
+def import_module(name):
+    """
+    Imports a module on first use and records the time spent for the import. Already imported modules are returned
+    without being timed again.
+
+    :param name: absolute module name, e.g. ``"confluent_kafka.avro"``
+    :type name: str
+
+    :return: the imported module
+    :rtype: module
+    """
+
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    with timed("import " + name):
+        return importlib.import_module(name)
+
+
+@contextmanager
+def timed(label):
+    """
+    Context manager which adds the wall time spent in its block to the startup timing of :data:`label`.
+
+    :param label: name of the measured step
+    :type label: str
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _timings[label] = _timings.get(label, 0.) + duration
+        logger.debug("%s took %.3f ms" % (label, duration * 1000))
+
+
+def timings():
+    """
+    :return: recorded startup steps in order of first occurrence with their accumulated duration in seconds
+    :rtype: OrderedDict
+    """
+    return OrderedDict(_timings)
+
+
+def report():
+    """
+    Creates a human readable report of all recorded import and connect times. Nested steps are listed on their own,
+    e.g. the import of ``confluent_kafka.avro`` is part of the first connect of a producer.
+
+    :return: one line per recorded step
+    :rtype: str
+    """
+
+    if not _timings:
+        return "No startup steps recorded"
+
+    width = max(len(label) for label in _timings)
+    return "\n".join("%s  %10.3f ms" % (label.ljust(width), duration * 1000)
+                     for label, duration in _timings.items())
+
+
+def reset():
+    """
+    Removes all recorded startup timings
+    """
+    _timings.clear()
@@ -47,7 +47,7 @@ class Timer(object):
     """Runs a predefined function every given interval
     """
 
-    def __init__(self, timer_function, interval=1, unit=Unit.SECOND, begin=Begin.FULL_SECOND):
+    def __init__(self, timer_function, interval=1, unit=Unit.SECOND, begin=Begin.FULL_SECOND, profiler=None):
 
         """
 
@@ -61,6 +61,9 @@ class Timer(object):
             :class:`kafka_connector.timer.Begin` elements or a list of :class:`datetime.time` including start times.
             In the third case, the start time is set to the time which is the closest from the current timestamp.
         :type begin: None or :class:`Begin` or list of :class:`datetime.time`
+        :param profiler: If set, records the phases ``tick`` (call of :data:`timer_function`), ``sleep`` and
+            ``overrun`` (delay of a tick behind its schedule)
+        :type profiler: :class:`~kafka_connector.profiling.PhaseProfiler`
         """
 
         if type(interval) != int:
@@ -81,6 +84,7 @@ class Timer(object):
         self.interval = interval
         self.unit = unit
         self.begin = begin
+        self.profiler = profiler
 
         self._started = False
         self._running = False
@@ -99,7 +103,7 @@ class Timer(object):
         next_run = None
 
         if self.begin is None or self.begin == Begin.IMMEDIATELY:
-            next_run = time.time()
+            next_run = time.time() * 1000
 
         elif self.begin == Begin.FULL_CENTISECOND:
             next_run = math.ceil(time.time() * 10) * 100
@@ -142,6 +146,10 @@ class Timer(object):
 
         while self._running:
 
+            if self.profiler is not None:
+                tick_start = self.profiler.begin()
+                self.profiler.record('overrun', max(0, time.time_ns() - int(next_run * 1000000)))
+
             try:
                 self.timer_function()
 
@@ -151,6 +159,9 @@ class Timer(object):
             except KeyboardInterrupt as e:
                 raise e
 
+            if self.profiler is not None:
+                self.profiler.end('tick', tick_start)
+
             if self.unit == Unit.MILLISECOND:
                 next_run += self.interval
 
@@ -168,7 +179,13 @@ class Timer(object):
             if sleep_time > 30:
                 logger.info("Going to sleep for " + Timer.str_timedelta(int(sleep_time)))
 
-            time.sleep(max(0., next_run / 1000 - time.time()))
+            if self.profiler is not None:
+                sleep_start = time.perf_counter_ns()
+                time.sleep(max(0., next_run / 1000 - time.time()))
+                self.profiler.lap('sleep', sleep_start)
+
+            else:
+                time.sleep(max(0., next_run / 1000 - time.time()))
 
         self._stopped = True
 
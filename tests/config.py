@@ -0,0 +1,82 @@
+import copy
+import gc
+import pickle
+import logging
+
+from kafka_connector.avro_loop_producer import AvroLoopProducer, default_config
+from kafka_connector.config import ConnectorConfig, shared_client
+
+LOGGING_FORMAT = "%(levelname)8s %(asctime)s %(name)s [%(filename)s:%(lineno)s - %(funcName)s() ] %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+default_config_before = copy.deepcopy(default_config)
+
+producer_a = AvroLoopProducer("kafka-a:9092", "http://localhost:8081", "topic_a",
+                              "key_schema.avsc", "value_schema.avsc", defer_connect=True)
+producer_b = AvroLoopProducer("kafka-b:9092", "http://localhost:8081", "topic_b",
+                              "key_schema.avsc", "value_schema.avsc", defer_connect=True)
+
+# creating producers does not touch the shared default config
+assert default_config == default_config_before
+assert producer_a.config['bootstrap.servers'] == "kafka-a:9092"
+assert producer_b.config['bootstrap.servers'] == "kafka-b:9092"
+
+# layers are merged without mutation, nested dicts key by key
+profile = {'default.topic.config': {'acks': 1}}
+merged = ConnectorConfig(default_config, profile, {'log_level': 7})
+assert merged['log_level'] == 7
+assert merged['default.topic.config'].to_dict() == {'produce.offset.report': True, 'acks': 1}
+assert profile == {'default.topic.config': {'acks': 1}}
+assert default_config == default_config_before
+
+# equal content means equal hash, independent of layer order of unrelated keys
+config_1 = ConnectorConfig({'a': 1}, {'b': 2})
+config_2 = ConnectorConfig({'b': 2, 'a': 1})
+assert config_1 == config_2 and hash(config_1) == hash(config_2)
+assert config_1 == {'a': 1, 'b': 2}
+assert config_1 != config_1.merge({'a': 3})
+assert len({config_1, config_2}) == 1
+
+# any hashable value is accepted, connection properties must be non-empty strings
+ConnectorConfig({'logger': logging.getLogger()})
+for invalid in ({'group.id': ''}, {'bootstrap.servers': 9092}, {'x': [1]}, {1: 'x'}):
+    try:
+        ConnectorConfig(invalid)
+        raise AssertionError("accepted " + repr(invalid))
+    except AttributeError:
+        pass
+
+try:
+    config_1.x = 1
+    raise AssertionError("config is mutable")
+except AttributeError:
+    pass
+
+# immutable configs are copied by reference and pickled by content
+assert copy.copy(merged) is merged
+assert copy.deepcopy(merged) is merged
+assert copy.deepcopy(producer_a.config) is producer_a.config
+unpickled = pickle.loads(pickle.dumps(merged))
+assert unpickled == merged and hash(unpickled) == hash(merged)
+assert isinstance(unpickled['default.topic.config'], ConnectorConfig)
+
+
+
+# shared clients are reused per key and dropped when unused
+class Client(object):
+    pass
+
+
+created = []
+first = shared_client((Client, config_1), lambda: created.append(1) or Client())
+second = shared_client((Client, config_2), lambda: created.append(1) or Client())
+assert first is second and len(created) == 1
+
+del first, second
+gc.collect()
+shared_client((Client, config_1), lambda: created.append(1) or Client())
+assert len(created) == 2
+
+logger.info("config checks passed")
@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+
+from kafka_connector.avro_loop_producer import AvroLoopProducer
+from kafka_connector.pacing import Pacer, TokenBucket
+from kafka_connector.timer import Begin, Unit
+
+LOGGING_FORMAT = "%(levelname)8s %(asctime)s %(name)s [%(filename)s:%(lineno)s - %(funcName)s() ] %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+def close(a, b, tolerance=0.01):
+    return abs(a - b) <= tolerance
+
+
+# tokens are reserved in advance, the delay grows with the debt
+bucket = TokenBucket(10, capacity=1)
+assert bucket.reserve(1) == 0.
+assert close(bucket.reserve(1), 0.1)
+assert close(bucket.reserve(2), 0.3)
+
+pacer = Pacer(messages_per_second=100, bytes_per_second=1000, burst=0.01)
+assert pacer.reserve(10) == 0.
+assert close(pacer.reserve(10), 0.01)
+assert close(pacer.reserve(100), 0.11)
+
+
+class FakeClient(object):
+    """
+    Stands in for the AvroProducer, records the time of every produced message
+    """
+
+    def __init__(self, queue_depth=0):
+        self.queue_depth = queue_depth
+        self.produced = []
+
+    def produce(self, **kwargs):
+        self.produced.append(time.perf_counter())
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, 0.001))
+        return 0
+
+    def __len__(self):
+        return self.queue_depth
+
+
+def fake_producer(pacing, client, config=None):
+    producer = AvroLoopProducer("localhost:9092", "http://localhost:8081", "testtopic",
+                                "key_schema.avsc", "value_schema.avsc", poll_timeout=False,
+                                config=config or {}, pacing=pacing, defer_connect=True)
+    producer._client = client
+    return producer
+
+
+# string values for queue.buffering.max.messages are accepted
+assert fake_producer(Pacer(10), FakeClient(), {'queue.buffering.max.messages': '1000'})._max_queue_depth == 800
+
+# messages of one tick are spread over the time left in the interval
+client = FakeClient()
+producer = fake_producer(Pacer(), client)
+producer._interval_seconds = 0.5
+
+
+def data_function():
+    time.sleep(0.1)
+    return [{'value': i} for i in range(4)]
+
+
+tick_start = time.perf_counter()
+producer._loop_produce(data_function)
+offsets = [t - client.produced[0] for t in client.produced]
+
+assert len(offsets) == 4
+assert all(close(offset, i * 0.1, 0.02) for i, offset in enumerate(offsets)), offsets
+assert time.perf_counter() - tick_start < 0.5
+
+# stop() ends a wait for a full queue while loop() is running
+client = FakeClient(queue_depth=10)
+producer = fake_producer(Pacer(max_queue_depth=5), client)
+threading.Timer(0.05, producer.stop).start()
+
+loop_start = time.perf_counter()
+producer.loop(lambda: {'value': 1}, interval=10, unit=Unit.MILLISECOND, begin=Begin.IMMEDIATELY)
+assert time.perf_counter() - loop_start < 1
+assert len(client.produced) == 1
+
+# produce() calls outside of loop() are still paced after stop()
+client = FakeClient()
+producer = fake_producer(Pacer(messages_per_second=10, burst=0.1), client)
+producer.stop()
+
+produce_start = time.perf_counter()
+for i in range(5):
+    producer.produce(value=i)
+assert time.perf_counter() - produce_start >= 0.35
+
+logger.info("pacing checks passed")
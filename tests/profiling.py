@@ -0,0 +1,305 @@
+import os
+import re
+import sys
+import json
+import time
+import types
+import logging
+import tempfile
+import threading
+
+from kafka_connector.avro_loop_consumer import AvroLoopConsumer
+from kafka_connector.avro_loop_producer import AvroLoopProducer
+from kafka_connector.pacing import Pacer
+from kafka_connector.profiling import Histogram, PhaseProfiler
+from kafka_connector.timer import Timer, Begin, Unit
+
+LOGGING_FORMAT = "%(levelname)8s %(asctime)s %(name)s [%(filename)s:%(lineno)s - %(funcName)s() ] %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+# percentiles are the upper bound of their power of two bucket, capped at the maximum
+histogram = Histogram()
+assert histogram.percentile(50) is None
+
+for duration in [100] * 90 + [5000] * 9 + [1000000]:
+    histogram.record(duration)
+
+assert histogram.count == 100
+assert histogram.min == 100 and histogram.max == 1000000
+assert histogram.percentile(50) == 127
+assert histogram.percentile(90) == 127
+assert histogram.percentile(99) == 8191
+assert histogram.percentile(100) == 1000000
+assert histogram.to_dict()['buckets'] == {'127': 90, '8191': 9, '1048575': 1}
+
+
+# only the slowest units are kept and written as collapsed stacks
+def slow_work(seconds):
+    time.sleep(seconds)
+
+
+profiler = PhaseProfiler()
+profiler.capture(2, sample_interval=0.001)
+
+for seconds in (0.005, 0.03, 0.001, 0.02):
+    start = profiler.begin()
+    slow_work(seconds)
+    profiler.end('tick', start)
+
+profiler.stop_capture()
+
+captures = profiler.captures
+assert [capture['unit'] for capture in captures] == ['tick', 'tick']
+assert captures[0]['duration_ns'] >= 30000000 > captures[1]['duration_ns'] >= 20000000
+assert captures[0]['samples'] > 0
+
+output_dir = tempfile.mkdtemp()
+collapsed_file = os.path.join(output_dir, 'ticks.folded')
+json_file = os.path.join(output_dir, 'ticks.json')
+
+profiler.dump_collapsed(collapsed_file)
+profiler.dump_json(json_file)
+
+with open(collapsed_file) as f:
+    lines = f.read().splitlines()
+
+assert lines
+for line in lines:
+    assert re.match(r"^tick;[^ ].* \d+$", line), line
+assert any(";slow_work (" in line for line in lines)
+
+with open(json_file) as f:
+    dump = json.load(f)
+
+assert dump['phases']['tick']['count'] == 4
+assert len(dump['captures']) == 2
+
+
+# a unit which is never ended does not charge its samples to the next unit of the thread
+profiler = PhaseProfiler()
+profiler.capture(5, sample_interval=0.001)
+
+profiler.begin()
+slow_work(0.03)
+
+start = profiler.begin()
+profiler.end('message', start)
+profiler.stop_capture()
+
+assert len(profiler.captures) == 1
+assert profiler.captures[0]['samples'] <= 1, profiler.captures[0]
+
+# units of different threads are captured independently
+profiler = PhaseProfiler()
+profiler.capture(5, sample_interval=0.001)
+
+
+def threaded_unit():
+    thread_start = profiler.begin()
+    slow_work(0.02)
+    profiler.end('tick', thread_start)
+
+
+threads = [threading.Thread(target=threaded_unit) for _ in range(3)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+profiler.stop_capture()
+
+assert profiler.histograms['tick'].count == 3
+assert len(profiler.captures) == 3
+assert all(capture['samples'] > 0 for capture in profiler.captures)
+
+# timer records tick, sleep and overrun
+profiler = PhaseProfiler()
+ticks = []
+
+
+def tick():
+    ticks.append(1)
+    if len(ticks) == 3:
+        timer.stop()
+
+
+timer = Timer(tick, 10, Unit.MILLISECOND, Begin.IMMEDIATELY, profiler=profiler)
+timer.start()
+
+assert profiler.histograms['tick'].count == 3
+assert profiler.histograms['overrun'].count == 3
+assert profiler.histograms['sleep'].count == 3
+assert profiler.histograms['sleep'].max < 20000000
+
+
+# stand-ins for confluent_kafka, the profiled paths call the base classes and serializer directly
+class SerializerError(Exception):
+    pass
+
+
+class KeySerializerError(SerializerError):
+    pass
+
+
+class ValueSerializerError(SerializerError):
+    pass
+
+
+class FakeSerializer(object):
+
+    def __init__(self):
+        self.decoded = []
+
+    def encode_record_with_schema(self, topic, schema, record, is_key=False):
+        return ("%s:%s:%s" % (topic, schema, record)).encode()
+
+    def decode_message(self, message, is_key=False):
+        self.decoded.append((message, is_key))
+        if message == b'broken':
+            raise SerializerError("cannot decode")
+        return ('key:' if is_key else 'value:') + message.decode()
+
+
+class FakeProducer(object):
+    """
+    Stands in for confluent_kafka.Producer and AvroProducer
+    """
+
+    def __init__(self):
+        self._serializer = FakeSerializer()
+        self.enqueued = []
+
+    def produce(self, topic, **kwargs):
+        self.enqueued.append(dict(kwargs, topic=topic))
+
+    def poll(self, timeout):
+        return 0
+
+    def __len__(self):
+        return 0
+
+
+class FakeMessage(object):
+
+    def __init__(self, key, value, offset):
+        self._key = key
+        self._value = value
+        self._offset = offset
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+    def set_key(self, key):
+        self._key = key
+
+    def set_value(self, value):
+        self._value = value
+
+    def error(self):
+        return None
+
+    def topic(self):
+        return "testtopic"
+
+    def partition(self):
+        return 0
+
+    def offset(self):
+        return self._offset
+
+
+class FakeConsumer(object):
+    """
+    Stands in for confluent_kafka.Consumer and AvroConsumer
+    """
+
+    def __init__(self, messages):
+        self._serializer = FakeSerializer()
+        self.messages = list(messages)
+
+    def poll(self, timeout):
+        return self.messages.pop(0) if self.messages else None
+
+    def close(self):
+        pass
+
+
+confluent_kafka = types.ModuleType('confluent_kafka')
+confluent_kafka.Producer = FakeProducer
+confluent_kafka.Consumer = FakeConsumer
+serializer = types.ModuleType('confluent_kafka.avro.serializer')
+serializer.SerializerError = SerializerError
+serializer.KeySerializerError = KeySerializerError
+serializer.ValueSerializerError = ValueSerializerError
+requests_exceptions = types.ModuleType('requests.exceptions')
+requests_exceptions.ConnectionError = type('ConnectionError', (Exception,), {})
+sys.modules.update([('confluent_kafka', confluent_kafka), ('confluent_kafka.avro.serializer', serializer),
+                    ('requests.exceptions', requests_exceptions)])
+
+# producer records its phases and hands the encoded size to the byte bucket
+profiler = PhaseProfiler()
+client = FakeProducer()
+producer = AvroLoopProducer("localhost:9092", "http://localhost:8081", "testtopic",
+                            "key_schema.avsc", "value_schema.avsc", poll_timeout=0.,
+                            pacing=Pacer(bytes_per_second=1, burst=1000), profiler=profiler, defer_connect=True)
+producer._client = client
+producer._key_schema = "k"
+producer._value_schema = "v"
+
+producer._loop_produce(lambda: {'key': 1, 'value': 'abc'})
+
+assert client.enqueued[0]['key'] == b"testtopic:k:1"
+assert client.enqueued[0]['value'] == b"testtopic:v:abc"
+encoded_size = len(b"testtopic:k:1") + len(b"testtopic:v:abc")
+assert 1000 - encoded_size <= producer._pacer.bytes._tokens < 1000 - encoded_size + 1
+for phase in ('data_function', 'encode', 'pace', 'enqueue', 'poll'):
+    assert profiler.histograms[phase].count == 1, phase
+
+# schema checks of AvroProducer.produce() are kept
+producer._key_schema = None
+try:
+    producer.produce(key=1, value='abc')
+    raise AssertionError("missing key schema accepted")
+except KeySerializerError:
+    pass
+
+producer._value_schema = None
+try:
+    producer.produce(value='abc')
+    raise AssertionError("missing value schema accepted")
+except ValueSerializerError:
+    pass
+
+# consumer decodes keys as keys, records its phases and names the message on decode errors
+profiler = PhaseProfiler()
+client = FakeConsumer([FakeMessage(b'k', b'v', 4), FakeMessage(None, b'broken', 5)])
+consumer = AvroLoopConsumer("localhost:9092", "http://localhost:8081", "testgroup", ["testtopic"],
+                            profiler=profiler, defer_connect=True)
+consumer._client = client
+
+received = []
+
+
+def handle_message(msg):
+    received.append((msg.key(), msg.value()))
+    consumer.stop()
+
+
+consumer.loop(handle_message)
+
+assert received == [('key:k', 'value:v')]
+assert (b'k', True) in client._serializer.decoded and (b'v', False) in client._serializer.decoded
+for phase in ('poll', 'decode', 'handler', 'message'):
+    assert profiler.histograms[phase].count == 1, phase
+
+try:
+    consumer._profiled_poll(client, 0.1)
+    raise AssertionError("broken message decoded")
+except SerializerError as e:
+    assert "testtopic [0] offset 5" in str(e), str(e)
+
+logger.info("profiling checks passed")
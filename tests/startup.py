@@ -0,0 +1,38 @@
+import sys
+import logging
+
+from kafka_connector import startup
+from kafka_connector.avro_loop_consumer import AvroLoopConsumer
+from kafka_connector.avro_loop_producer import AvroLoopProducer
+
+LOGGING_FORMAT = "%(levelname)8s %(asctime)s %(name)s [%(filename)s:%(lineno)s - %(funcName)s() ] %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+# importing the loop modules and creating deferred instances must not import the client libraries
+producer = AvroLoopProducer("localhost:9092", "http://localhost:8081", "testtopic",
+                            "key_schema.avsc", "value_schema.avsc", defer_connect=True)
+consumer = AvroLoopConsumer("localhost:9092", "http://localhost:8081", "testgroup", ["testtopic"],
+                            defer_connect=True)
+
+for module in ('confluent_kafka', 'confluent_kafka.avro', 'avro', 'requests'):
+    assert module not in sys.modules, module + " imported before first use"
+
+# attribute lookups on a deferred instance do not connect
+assert not hasattr(producer, 'flush')
+assert not hasattr(consumer, 'commit')
+assert len(producer) == 0
+assert 'confluent_kafka' not in sys.modules
+
+# lazy imports are timed once
+startup.reset()
+startup.import_module('wave')
+startup.import_module('wave')
+assert list(startup.timings()) == ['import wave']
+
+with startup.timed("connect"):
+    pass
+assert list(startup.timings()) == ['import wave', 'connect']
+
+logger.info("\n" + startup.report())